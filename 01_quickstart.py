@@ -41,6 +41,12 @@ graph = graph_builder.compile()
 
 # 5. Execute
 if __name__ == "__main__":
-    result = graph.invoke({"messages": [("user", "What is LangGraph? One sentence.")]})
     print("=== Result ===")
-    print(result["messages"][-1].content)
+    # stream_mode="messages" yields LLM tokens as they arrive; llm.invoke inside
+    # the node switches to streaming automatically, so the node is unchanged
+    for chunk, metadata in graph.stream(
+        {"messages": [("user", "What is LangGraph? One sentence.")]},
+        stream_mode="messages",
+    ):
+        print(chunk.text, end="", flush=True)
+    print()
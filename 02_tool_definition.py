@@ -79,14 +79,21 @@ search_tool = StructuredTool.from_function(
 # Compare tool schemas
 # =============================================================================
 
-if __name__ == "__main__":
-    tools = [get_weather_simple, get_weather_typed, get_weather_pydantic, search_tool]
+tools = [get_weather_simple, get_weather_typed, get_weather_pydantic, search_tool]
+
+# JSON schemas are generated once at import; Pydantic reflection is not free
+_SCHEMA_CACHE = {
+    t.name: t.args_schema.model_json_schema() if t.args_schema else None
+    for t in tools
+}
 
+
+if __name__ == "__main__":
     for t in tools:
         print(f"\n{'='*60}")
         print(f"Tool: {t.name}")
         print(f"Description: {t.description}")
-        print(f"Args Schema: {t.args_schema.model_json_schema() if t.args_schema else 'None'}")
+        print(f"Args Schema: {_SCHEMA_CACHE[t.name] or 'None'}")
 
     print("\n" + "="*60)
     print("SUMMARY")
@@ -3,11 +3,16 @@ Tool Calling - Part 2: Tool Execution with ToolNode
 Auto-processing, error handling, multiple tools
 """
 
+import ast
+import uuid
+from functools import lru_cache
+from types import CodeType
 from typing import Annotated, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import AIMessage, BaseMessage, BaseMessageChunk
 from langchain_core.tools import tool
 
 
@@ -15,36 +20,114 @@ from langchain_core.tools import tool
 # State
 # =============================================================================
 
+def append_messages(left: list, right) -> list:
+    """add_messages with a fast path for appending one new message."""
+    # Common case: a node returns [message] with no id yet (e.g. a single
+    # ToolMessage). A freshly assigned id can't collide with an existing one,
+    # so append without add_messages' pass over the whole existing list.
+    # Anything else (ids already set, tuples, chunks, removals, several
+    # messages) goes through add_messages for conversion and dedupe.
+    if isinstance(left, list) and isinstance(right, list) and len(right) == 1:
+        msg = right[0]
+        if (
+            isinstance(msg, BaseMessage)
+            and not isinstance(msg, BaseMessageChunk)
+            and msg.id is None
+        ):
+            msg.id = str(uuid.uuid4())
+            return [*left, msg]
+    return add_messages(left, right)
+
+
 class State(TypedDict):
-    messages: Annotated[list, add_messages]
+    messages: Annotated[list, append_messages]
 
 
 # =============================================================================
 # Tools - Various scenarios
 # =============================================================================
 
+_WEATHER = {"tokyo": "Sunny, 22°C", "osaka": "Cloudy, 19°C", "london": "Rainy, 12°C"}
+_PRICES = {"AAPL": "$178.50", "GOOGL": "$141.20", "MSFT": "$378.90"}
+
+
+@lru_cache(maxsize=256)
+def _weather_lookup(city: str) -> str:
+    return _WEATHER.get(city.lower(), f"No data for {city}")
+
+
+@lru_cache(maxsize=256)
+def _price_lookup(symbol: str) -> str:
+    return _PRICES.get(symbol.upper(), f"Unknown symbol: {symbol}")
+
+
 @tool
 def get_weather(city: str) -> str:
     """Get current weather for a city."""
-    data = {"tokyo": "Sunny, 22°C", "osaka": "Cloudy, 19°C", "london": "Rainy, 12°C"}
-    return data.get(city.lower(), f"No data for {city}")
+    return _weather_lookup(city)
 
 
 @tool
 def get_stock_price(symbol: str) -> str:
     """Get current stock price for a symbol."""
-    prices = {"AAPL": "$178.50", "GOOGL": "$141.20", "MSFT": "$378.90"}
-    return prices.get(symbol.upper(), f"Unknown symbol: {symbol}")
+    return _price_lookup(symbol)
+
+
+_CALC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Pow, ast.USub, ast.UAdd,
+)
+
+# Integer powers above this size are refused: "9**9**9" is 11 characters
+_MAX_POW_BITS = 10_000
+
+
+def _checked_pow(base, exp):
+    if isinstance(base, int) and isinstance(exp, int) and exp > 0 and base.bit_length() * exp > _MAX_POW_BITS:
+        raise ValueError("exponent too large")
+    return base ** exp
+
+
+class _PowToCall(ast.NodeTransformer):
+    """Rewrite `a ** b` as `_pow(a, b)` (runs after the whitelist check)."""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if not isinstance(node.op, ast.Pow):
+            return node
+        call = ast.Call(ast.Name("_pow", ast.Load()), [node.left, node.right], [])
+        return ast.copy_location(call, node)
+
+
+_CALC_GLOBALS = {"__builtins__": {}, "_pow": _checked_pow}
+
+
+@lru_cache(maxsize=256)
+def _compile_expression(expression: str) -> CodeType | None:
+    """Parse and whitelist an arithmetic expression; None if not allowed."""
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _CALC_NODES):
+            return None
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float):
+            return None
+    tree = ast.fix_missing_locations(_PowToCall().visit(tree))
+    return compile(tree, "<calc>", "eval")
+
+
+_ALLOWED_CHARS = b"0123456789+-*/.() "
 
 
 @tool
 def calculate(expression: str) -> str:
-    """Evaluate a mathematical expression."""
+    """Evaluate a mathematical expression (+ - * / // ** and parentheses)."""
     try:
-        # Safe eval for simple math
-        allowed = set("0123456789+-*/.(). ")
-        if all(c in allowed for c in expression):
-            return str(eval(expression))
+        # Cheap character check first (bytes.translate deletes allowed chars in
+        # C; anything left over is invalid), then AST whitelist
+        if expression.isascii() and not expression.encode().translate(None, _ALLOWED_CHARS):
+            code = _compile_expression(expression)
+            if code is not None:
+                return str(eval(code, _CALC_GLOBALS, {}))
         return "Invalid expression"
     except Exception as e:
         return f"Error: {e}"
@@ -71,8 +154,8 @@ def agent(state: State) -> State:
 
 
 def should_continue(state: State) -> str:
-    last = state["messages"][-1]
-    return "tools" if last.tool_calls else END
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None)
+    return "tools" if tool_calls else END
 
 
 graph_builder = StateGraph(State)
@@ -89,6 +172,22 @@ graph = graph_builder.compile()
 # Test scenarios
 # =============================================================================
 
+def _print_message(i: int, msg) -> None:
+    content = msg.content[:100] + "..." if len(str(msg.content)) > 100 else msg.content
+    print(f"  [{i}] {type(msg).__name__}: {content}")
+
+
+def _print_ai(i: int, msg: AIMessage) -> None:
+    if msg.tool_calls:
+        print(f"  [{i}] AIMessage: tool_calls={[tc['name'] for tc in msg.tool_calls]}")
+    else:
+        _print_message(i, msg)
+
+
+# Message class -> printer; Human/Tool messages use the default
+_PRINTERS = {AIMessage: _print_ai}
+
+
 def run_test(name: str, query: str):
     print(f"\n{'='*60}")
     print(f"TEST: {name}")
@@ -100,12 +199,7 @@ def run_test(name: str, query: str):
 
         # Show message flow
         for i, msg in enumerate(result["messages"]):
-            msg_type = type(msg).__name__
-            if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                print(f"  [{i}] {msg_type}: tool_calls={[tc['name'] for tc in msg.tool_calls]}")
-            elif hasattr(msg, 'content'):
-                content = msg.content[:100] + "..." if len(str(msg.content)) > 100 else msg.content
-                print(f"  [{i}] {msg_type}: {content}")
+            _PRINTERS.get(type(msg), _print_message)(i, msg)
 
         print(f"\nFinal: {result['messages'][-1].content}")
     except Exception as e:
@@ -3,6 +3,10 @@ Tool Calling - Part 3: Error Handling Deep Dive
 What happens when tools fail? Custom error handling strategies.
 """
 
+import asyncio
+import operator
+import random
+from types import MappingProxyType
 from typing import Annotated, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
@@ -18,7 +22,7 @@ from langchain_core.messages import ToolMessage
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
-    error_count: int
+    error_count: Annotated[int, operator.add]
 
 
 # =============================================================================
@@ -28,7 +32,6 @@ class State(TypedDict):
 @tool
 def flaky_api(query: str) -> str:
     """Simulates a flaky API that sometimes fails."""
-    import random
     if random.random() < 0.5:
         raise ConnectionError("API temporarily unavailable")
     return f"API result for: {query}"
@@ -63,13 +66,12 @@ class RetryToolNode:
     def __init__(self, tools: list, max_retries: int = 2):
         self.tool_node = ToolNode(tools)
         self.max_retries = max_retries
-        self.tools_by_name = {t.name: t for t in tools}
+        self.tools_by_name = MappingProxyType({t.name: t for t in tools})
 
-    def __call__(self, state: State) -> State:
+    async def __call__(self, state: State) -> State:
         last_message = state["messages"][-1]
-        results = []
 
-        for tool_call in last_message.tool_calls:
+        async def run_one(tool_call: dict) -> ToolMessage:
             tool_name = tool_call["name"]
             tool_args = tool_call["args"]
             tool_id = tool_call["id"]
@@ -80,19 +82,25 @@ class RetryToolNode:
             for attempt in range(self.max_retries + 1):
                 try:
                     tool_fn = self.tools_by_name[tool_name]
-                    result = tool_fn.invoke(tool_args)
+                    result = await tool_fn.ainvoke(tool_args)
                     break
                 except Exception as e:
                     last_error = e
                     print(f"  Attempt {attempt + 1} failed: {e}")
 
             if result is not None:
-                results.append(ToolMessage(content=result, tool_call_id=tool_id))
-            else:
-                error_msg = f"Failed after {self.max_retries + 1} attempts: {last_error}"
-                results.append(ToolMessage(content=error_msg, tool_call_id=tool_id))
+                return ToolMessage(content=result, tool_call_id=tool_id)
+            error_msg = f"Failed after {self.max_retries + 1} attempts: {last_error}"
+            return ToolMessage(content=error_msg, tool_call_id=tool_id, status="error")
 
-        return {"messages": results, "error_count": state.get("error_count", 0)}
+        # Parallel tool calls run concurrently: latency is max(call), not sum(call)
+        results = await asyncio.gather(
+            *(run_one(tc) for tc in last_message.tool_calls)
+        )
+
+        # error_count is a reducer channel: return the delta, not the total
+        errors = sum(1 for r in results if r.status == "error")
+        return {"messages": list(results), "error_count": errors}
 
 
 # =============================================================================
@@ -103,16 +111,14 @@ llm = ChatAnthropic(model="claude-sonnet-4-20250514")
 llm_with_tools = llm.bind_tools(tools)
 
 
-def agent(state: State) -> State:
-    response = llm_with_tools.invoke(state["messages"])
-    return {"messages": [response], "error_count": state.get("error_count", 0)}
+async def agent(state: State) -> State:
+    response = await llm_with_tools.ainvoke(state["messages"])
+    return {"messages": [response]}
 
 
 def should_continue(state: State) -> str:
-    last = state["messages"][-1]
-    if hasattr(last, "tool_calls") and last.tool_calls:
-        return "tools"
-    return END
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None)
+    return "tools" if tool_calls else END
 
 
 # Build two graphs: default and retry
@@ -136,7 +142,7 @@ def build_graph(use_retry: bool = False):
 # Tests
 # =============================================================================
 
-def test_default_error_handling():
+async def test_default_error_handling():
     """Test how default ToolNode handles errors."""
     print("\n" + "="*60)
     print("DEFAULT ERROR HANDLING")
@@ -145,7 +151,7 @@ def test_default_error_handling():
     graph = build_graph(use_retry=False)
 
     # Test validation error
-    result = graph.invoke({
+    result = await graph.ainvoke({
         "messages": [("user", "Process the number 'abc' using validation_error_tool")],
         "error_count": 0
     })
@@ -158,7 +164,7 @@ def test_default_error_handling():
     print(f"LLM receives error and explains it to user")
 
 
-def test_retry_error_handling():
+async def test_retry_error_handling():
     """Test custom retry logic."""
     print("\n" + "="*60)
     print("RETRY ERROR HANDLING")
@@ -168,15 +174,16 @@ def test_retry_error_handling():
 
     # Test flaky API (may succeed after retry)
     print("\nTesting flaky API with retry...")
-    result = graph.invoke({
+    result = await graph.ainvoke({
         "messages": [("user", "Query the flaky_api with 'test query'")],
         "error_count": 0
     })
 
     print(f"\nFinal response: {result['messages'][-1].content[:200]}...")
+    print(f"Failed tool calls: {result['error_count']}")
 
 
-def test_error_message_format():
+async def test_error_message_format():
     """Examine the exact format of error messages via graph."""
     print("\n" + "="*60)
     print("ERROR MESSAGE FORMAT")
@@ -184,24 +191,28 @@ def test_error_message_format():
 
     graph = build_graph(use_retry=False)
 
-    result = graph.invoke({
+    result = await graph.ainvoke({
         "messages": [("user", "Use timeout_tool with 100 seconds")],
         "error_count": 0
     })
 
     # Find ToolMessage with error
     for msg in result["messages"]:
-        if type(msg).__name__ == "ToolMessage":
+        if isinstance(msg, ToolMessage):
             print(f"\nToolMessage:")
             print(f"  tool_call_id: {msg.tool_call_id}")
             print(f"  content: {msg.content}")
             print(f"  status: {getattr(msg, 'status', 'N/A')}")
 
 
+async def main():
+    await test_default_error_handling()
+    await test_retry_error_handling()
+    await test_error_message_format()
+
+
 if __name__ == "__main__":
-    test_default_error_handling()
-    test_retry_error_handling()
-    test_error_message_format()
+    asyncio.run(main())
 
     print("\n" + "="*60)
     print("ERROR HANDLING SUMMARY")
@@ -71,10 +71,8 @@ def human_approval(state: State) -> State:
 
 def should_continue(state: State) -> str:
     """Conditional edge"""
-    last_message = state["messages"][-1]
-    if last_message.tool_calls:
-        return "human_approval"
-    return END
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None)
+    return "human_approval" if tool_calls else END
 
 
 # 5. Graph construction
@@ -20,7 +20,10 @@ class State(TypedDict):
 
 
 # 2. Tool definition
-@tool
+# cache_control on the last tool marks the tools block as a cacheable prompt
+# prefix, shared by every run_test call below. Anthropic only caches prefixes
+# of 1024+ tokens (Sonnet), so it takes effect once the tool list grows.
+@tool(extras={"cache_control": {"type": "ephemeral"}})
 def send_email(to: str, subject: str, body: str) -> str:
     """Send an email. Requires human approval."""
     return f"Email sent to {to} with subject '{subject}'"
@@ -84,10 +87,8 @@ def human_approval(state: State) -> Command:
 
 def should_continue(state: State) -> str:
     """Conditional edge"""
-    last_message = state["messages"][-1]
-    if last_message.tool_calls:
-        return "human_approval"
-    return END
+    tool_calls = getattr(state["messages"][-1], "tool_calls", None)
+    return "human_approval" if tool_calls else END
 
 
 # 5. Graph construction
@@ -3,44 +3,83 @@ Durable Execution - Part 1: Basic Checkpoint Behavior
 When is checkpoint saved? What's stored? Resume after restart?
 """
 
+import asyncio
+import operator
 import os
+import re
 import sys
 import sqlite3
+import threading
 from typing import Annotated, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 
 DB_PATH = "checkpoints.db"
 
-# Global connection for persistence across graph instances
-_conn = None
-
-def get_connection():
-    global _conn
-    if _conn is None:
-        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    return _conn
+# One writer connection per thread (persists across graph instances), plus a
+# per-thread read-only connection for direct inspection queries
+_conns: dict[tuple[int, bool], sqlite3.Connection] = {}
+_conns_lock = threading.Lock()
+
+def get_connection(readonly: bool = False):
+    key = (threading.get_ident(), readonly)
+    conn = _conns.get(key)
+    if conn is None:
+        if readonly:
+            # (check_same_thread=False only so reset_connection can close it)
+            conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            # check_same_thread=False is still required: LangGraph writes
+            # checkpoints from its background executor, not the caller's thread
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            # 8KB pages: a checkpoint row mostly fits in one page. Only takes
+            # effect on a new DB (before WAL / the first table).
+            conn.execute("PRAGMA page_size=8192")
+            # WAL: readers don't block the writer, commits append instead of rewriting.
+            # synchronous=NORMAL is durable across app crashes in WAL mode (only an
+            # OS crash/power loss can drop the last commits).
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-65536")  # 64MB
+            conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+        with _conns_lock:
+            _conns[key] = conn
+    return conn
 
 def reset_connection():
-    global _conn
-    if _conn:
-        _conn.close()
-    _conn = None
+    with _conns_lock:
+        for conn in _conns.values():
+            conn.close()
+        _conns.clear()
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
 
 
+def db_logical_size(conn) -> int:
+    """DB size in bytes as SQLite sees it, including pages still in the WAL."""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
 # =============================================================================
 # State with custom fields
 # =============================================================================
 
+def dict_merge(a: dict, b: dict) -> dict:
+    return {**a, **b}
+
+
 class State(TypedDict):
     messages: Annotated[list, add_messages]
-    step_count: int
-    metadata: dict
+    # Reducers: nodes return deltas, LangGraph merges them into the channel
+    step_count: Annotated[int, operator.add]
+    metadata: Annotated[dict, dict_merge]
 
 
 # =============================================================================
@@ -55,8 +94,8 @@ def step1(state: State) -> State:
     response = llm.invoke(state["messages"])
     return {
         "messages": [response],
-        "step_count": state.get("step_count", 0) + 1,
-        "metadata": {**state.get("metadata", {}), "step1_done": True}
+        "step_count": 1,
+        "metadata": {"step1_done": True}
     }
 
 
@@ -65,8 +104,8 @@ def step2(state: State) -> State:
     response = llm.invoke(state["messages"] + [HumanMessage(content="Continue with more detail.")])
     return {
         "messages": [response],
-        "step_count": state.get("step_count", 0) + 1,
-        "metadata": {**state.get("metadata", {}), "step2_done": True}
+        "step_count": 1,
+        "metadata": {"step2_done": True}
     }
 
 
@@ -75,8 +114,29 @@ def step3(state: State) -> State:
     response = llm.invoke(state["messages"] + [HumanMessage(content="Summarize in one sentence.")])
     return {
         "messages": [response],
-        "step_count": state.get("step_count", 0) + 1,
-        "metadata": {**state.get("metadata", {}), "step3_done": True}
+        "step_count": 1,
+        "metadata": {"step3_done": True}
+    }
+
+
+FUSED_PROMPT = """Answer in three parts, each wrapped in its tag:
+<step1>your answer</step1>
+<step2>the same answer continued with more detail</step2>
+<step3>a one-sentence summary</step3>"""
+
+
+def combined_step(state: State) -> State:
+    """step1-3 fused into one LLM call (one TTFT, context sent once)."""
+    print(f"  [Combined] Executing... (current step_count: {state.get('step_count', 0)})")
+    response = llm.invoke(state["messages"] + [HumanMessage(content=FUSED_PROMPT)])
+    parts = re.findall(r"<step(\d)>(.*?)</step\1>", response.text, re.S)
+    if not parts:
+        # Model ignored the format: keep the raw answer as a single step
+        return {"messages": [response], "step_count": 1, "metadata": {"step1_done": True}}
+    return {
+        "messages": [AIMessage(content=text.strip()) for _, text in parts],
+        "step_count": len(parts),
+        "metadata": {f"step{n}_done": True for n, _ in parts}
     }
 
 
@@ -84,19 +144,26 @@ def step3(state: State) -> State:
 # Graph
 # =============================================================================
 
-def build_graph():
+def build_graph(checkpointer=None, fused: bool = False):
     builder = StateGraph(State)
-    builder.add_node("step1", step1)
-    builder.add_node("step2", step2)
-    builder.add_node("step3", step3)
+    if fused:
+        # One node = one checkpoint: a crash mid-run restarts all three steps
+        builder.add_node("combined_step", combined_step)
+        builder.add_edge(START, "combined_step")
+        builder.add_edge("combined_step", END)
+    else:
+        builder.add_node("step1", step1)
+        builder.add_node("step2", step2)
+        builder.add_node("step3", step3)
 
-    builder.add_edge(START, "step1")
-    builder.add_edge("step1", "step2")
-    builder.add_edge("step2", "step3")
-    builder.add_edge("step3", END)
+        builder.add_edge(START, "step1")
+        builder.add_edge("step1", "step2")
+        builder.add_edge("step2", "step3")
+        builder.add_edge("step3", END)
 
     # SQLite checkpointer for durability
-    checkpointer = SqliteSaver(get_connection())
+    if checkpointer is None:
+        checkpointer = SqliteSaver(get_connection())
     return builder.compile(checkpointer=checkpointer)
 
 
@@ -131,11 +198,11 @@ def test_checkpoint_timing():
 
     # Check checkpoint history
     print("\nCheckpoint history:")
-    for i, state in enumerate(graph.get_state_history(config)):
+    # limit= is pushed down to the checkpointer's SQL query
+    for i, state in enumerate(graph.get_state_history(config, limit=7)):
         print(f"  [{i}] next={state.next}, step_count={state.values.get('step_count', 'N/A')}")
         if i > 5:
             print("  ... (truncated)")
-            break
 
 
 def test_resume_after_interrupt():
@@ -217,10 +284,70 @@ def test_state_contents():
     print(f"Custom step_count: {state.values.get('step_count')}")
     print(f"Custom metadata: {state.values.get('metadata')}")
 
-    # Check DB size
-    if os.path.exists(DB_PATH):
-        size = os.path.getsize(DB_PATH)
-        print(f"\nCheckpoint DB size: {size / 1024:.1f} KB")
+    rows = get_connection(readonly=True).execute(
+        "SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", ("contents-test",)
+    ).fetchone()[0]
+    print(f"Checkpoint rows for thread: {rows}")
+
+    # Check DB size (the file alone misses pages not yet checkpointed from the WAL)
+    size = db_logical_size(get_connection())
+    print(f"\nCheckpoint DB size: {size / 1024:.1f} KB")
+
+
+async def test_async_checkpointer():
+    """Same graph on AsyncSqliteSaver: checkpoint writes don't block the event loop."""
+    print("\n" + "="*60)
+    print("TEST: Async Checkpointer")
+    print("="*60)
+
+    reset_connection()
+
+    # aiosqlite runs the connection on its own thread; the event loop stays free
+    # for other runs while a checkpoint is being written
+    async with AsyncSqliteSaver.from_conn_string(DB_PATH) as checkpointer:
+        graph = build_graph(checkpointer)
+        config = {"configurable": {"thread_id": "async-test"}}
+
+        result = await graph.ainvoke(
+            {
+                "messages": [("user", "Explain asyncio in 3 points")],
+                "step_count": 0,
+                "metadata": {}
+            },
+            config=config
+        )
+        print(f"\nFinal step_count: {result['step_count']}")
+
+        saved = 0
+        async for _ in graph.aget_state_history(config):
+            saved += 1
+        print(f"Checkpoints saved: {saved}")
+
+
+def test_fused_steps():
+    """Compare the fused single-call graph with the per-step graph."""
+    print("\n" + "="*60)
+    print("TEST: Fused Steps")
+    print("="*60)
+
+    reset_connection()
+
+    graph = build_graph(fused=True)
+    config = {"configurable": {"thread_id": "fused-test"}}
+
+    result = graph.invoke(
+        {
+            "messages": [("user", "Explain Python in 3 points")],
+            "step_count": 0,
+            "metadata": {}
+        },
+        config=config
+    )
+
+    print(f"\nFinal step_count: {result['step_count']}")
+    print(f"Final metadata: {result['metadata']}")
+    print(f"Checkpoints saved: {sum(1 for _ in graph.get_state_history(config))}")
+    print("Trade-off: 1 LLM call instead of 3, but resume granularity is the whole run")
 
 
 def show_summary():
@@ -251,14 +378,20 @@ def show_summary():
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "timing":
-        test_checkpoint_timing()
-    elif len(sys.argv) > 1 and sys.argv[1] == "restart":
-        test_resume_after_interrupt()
-    elif len(sys.argv) > 1 and sys.argv[1] == "contents":
-        test_state_contents()
-    else:
-        test_checkpoint_timing()
-        test_resume_after_interrupt()
-        test_state_contents()
+    tests = {
+        "timing": test_checkpoint_timing,
+        "restart": test_resume_after_interrupt,
+        "contents": test_state_contents,
+        "async": lambda: asyncio.run(test_async_checkpointer()),
+        "fused": test_fused_steps,
+    }
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode is None:
+        for test in tests.values():
+            test()
         show_summary()
+    elif mode in tests:
+        tests[mode]()
+    else:
+        print(f"Unknown mode: {mode} (choose from: {', '.join(tests)})")
+        sys.exit(2)
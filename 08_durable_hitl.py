@@ -3,34 +3,64 @@ Durable Execution - Part 2: HITL + Durability
 interrupt() -> process restart -> Command(resume=...) -> continue
 """
 
+import hashlib
+import hmac
+import json
 import os
 import sys
 import sqlite3
+import threading
+import time
+from functools import cache
 from typing import Annotated, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.config import get_config
 from langgraph.types import interrupt, Command
 from langgraph.prebuilt import ToolNode
 from langchain_anthropic import ChatAnthropic
 from langchain_core.tools import tool
 from langchain_core.messages import ToolMessage
 
+from checkpoint_serde import ZstdSerializer
+
 DB_PATH = "checkpoints_hitl.db"
 
+# One shared connection; SqliteSaver serializes reads and writes on its lock
 _conn = None
+_audit = None
+_conns_lock = threading.Lock()
 
 def get_connection():
     global _conn
-    if _conn is None:
-        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    return _conn
+    with _conns_lock:
+        if _conn is None:
+            # check_same_thread=False: LangGraph writes checkpoints from its
+            # background executor, not the caller's thread
+            _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            # 8KB pages: a compressed checkpoint row mostly fits in one page.
+            # Only takes effect on a new DB (before WAL / the first table);
+            # reset_connection() recreates the file, so that's every test.
+            _conn.execute("PRAGMA page_size=8192")
+            # WAL + synchronous=NORMAL: a checkpoint commit appends to the WAL
+            # without an fsync; durable across app crashes (not OS power loss)
+            _conn.execute("PRAGMA journal_mode=WAL")
+            _conn.execute("PRAGMA synchronous=NORMAL")
+            _conn.execute("PRAGMA temp_store=MEMORY")
+            _conn.execute("PRAGMA cache_size=-65536")  # 64MB
+            _conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+        return _conn
 
 def reset_connection():
-    global _conn
-    if _conn:
-        _conn.close()
-    _conn = None
+    global _conn, _audit
+    with _conns_lock:
+        if _conn:
+            _conn.close()
+        _conn = None
+        if _audit:
+            _audit.conn.close()
+        _audit = None
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
 
@@ -63,6 +93,100 @@ def delete_record(record_id: str) -> str:
 tools = [send_email, delete_record]
 
 
+# =============================================================================
+# Audit log: append-only, HMAC-chained, kept out of checkpoint state
+# =============================================================================
+
+AUDIT_KEY = os.environ.get("AUDIT_HMAC_KEY", "").encode()
+if not AUDIT_KEY:
+    # Anyone can recompute a chain signed with a published key
+    AUDIT_KEY = b"dev-only-audit-key"
+    print(
+        "WARNING: AUDIT_HMAC_KEY is not set; the audit log is signed with a "
+        "public dev key and proves nothing. Set it outside local testing.",
+        file=sys.stderr,
+    )
+
+
+class AuditLog:
+    """Append-only log of approval decisions.
+
+    Each row's HMAC covers the previous row's HMAC, so editing or deleting
+    a past row breaks every later link. Rows with an `event_key` are
+    written once: a replayed node appending the same event is a no-op.
+    """
+
+    def __init__(self, conn, key: bytes = AUDIT_KEY):
+        self.conn = conn
+        self.key = key
+        self.lock = threading.Lock()
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS audit_log (
+                    thread_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    ts REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    event_key TEXT,
+                    payload BLOB NOT NULL,
+                    prev_hmac BLOB NOT NULL,
+                    hmac BLOB NOT NULL,
+                    PRIMARY KEY (thread_id, seq),
+                    UNIQUE (thread_id, event_key)
+                )
+                """
+            )
+
+    def _sign(self, prev_hmac: bytes, ts: float, kind: str, event_key: str | None, payload: bytes) -> bytes:
+        message = prev_hmac + f"|{ts!r}|{kind}|{event_key or ''}|".encode() + payload
+        return hmac.new(self.key, message, hashlib.sha256).digest()
+
+    def append(self, thread_id: str, kind: str, record: dict, event_key: str | None = None) -> bool:
+        """Append a record; return False if `event_key` is already logged."""
+        payload = json.dumps(record, sort_keys=True).encode()
+        with self.lock, self.conn:
+            if event_key is not None and self.conn.execute(
+                "SELECT 1 FROM audit_log WHERE thread_id = ? AND event_key = ?",
+                (thread_id, event_key),
+            ).fetchone():
+                return False
+            row = self.conn.execute(
+                "SELECT seq, hmac FROM audit_log WHERE thread_id = ? ORDER BY seq DESC LIMIT 1",
+                (thread_id,),
+            ).fetchone()
+            seq, prev_hmac = (row[0] + 1, row[1]) if row else (0, b"")
+            ts = time.time()
+            self.conn.execute(
+                "INSERT INTO audit_log (thread_id, seq, ts, kind, event_key, payload, prev_hmac, hmac) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, seq, ts, kind, event_key, payload, prev_hmac,
+                 self._sign(prev_hmac, ts, kind, event_key, payload)),
+            )
+        return True
+
+    def verify(self, thread_id: str) -> int:
+        """Return the number of entries; raise ValueError if the chain is broken."""
+        prev = b""
+        rows = self.conn.execute(
+            "SELECT seq, ts, kind, event_key, payload, prev_hmac, hmac FROM audit_log WHERE thread_id = ? ORDER BY seq",
+            (thread_id,),
+        ).fetchall()
+        for seq, ts, kind, event_key, payload, prev_hmac, mac in rows:
+            if prev_hmac != prev or not hmac.compare_digest(mac, self._sign(prev, ts, kind, event_key, payload)):
+                raise ValueError(f"audit_log chain broken at {thread_id}#{seq}")
+            prev = mac
+        return len(rows)
+
+
+def get_audit_log() -> AuditLog:
+    global _audit
+    with _conns_lock:
+        if _audit is None:
+            # Own connection: appends never interleave with the saver's transactions
+            _audit = AuditLog(sqlite3.connect(DB_PATH, check_same_thread=False))
+        return _audit
+
+
 # =============================================================================
 # Nodes
 # =============================================================================
@@ -71,16 +195,21 @@ llm = ChatAnthropic(model="claude-sonnet-4-20250514")
 llm_with_tools = llm.bind_tools(tools)
 
 
-def agent(state: State) -> State:
+def agent(state: State) -> Command:
     response = llm_with_tools.invoke(state["messages"])
-    return {"messages": [response], "approval_count": state.get("approval_count", 0)}
+    # Route here from the response we already hold (no conditional edge)
+    goto = "human_approval" if getattr(response, "tool_calls", None) else END
+    return Command(
+        goto=goto,
+        update={"messages": [response], "approval_count": state.get("approval_count", 0)},
+    )
 
 
 def human_approval(state: State) -> Command:
     """Interrupt for human approval - survives restart."""
     last_message = state["messages"][-1]
 
-    if not hasattr(last_message, "tool_calls") or not last_message.tool_calls:
+    if not getattr(last_message, "tool_calls", None):
         return Command(goto=END)
 
     tool_call = last_message.tool_calls[0]
@@ -93,6 +222,16 @@ def human_approval(state: State) -> Command:
         "approval_count": state.get("approval_count", 0),
     })
 
+    # The decision goes to the audit log; state only keeps approval_count.
+    # The node re-runs on resume/replay: key the entry on the tool call so
+    # it is logged once.
+    get_audit_log().append(get_config()["configurable"]["thread_id"], "hil_decision", {
+        "tool_call_id": tool_call["id"],
+        "tool_name": tool_call["name"],
+        "tool_args": tool_call["args"],
+        "decision": decision,
+    }, event_key=tool_call["id"])
+
     if decision.get("action") == "approve":
         return Command(
             goto="tools",
@@ -108,29 +247,28 @@ def human_approval(state: State) -> Command:
     return Command(goto=END)
 
 
-def should_continue(state: State) -> str:
-    last = state["messages"][-1]
-    if hasattr(last, "tool_calls") and last.tool_calls:
-        return "human_approval"
-    return END
-
-
 # =============================================================================
 # Graph
 # =============================================================================
 
-def build_graph():
+@cache
+def _compile_graph():
+    """Build and compile once; build_graph() only attaches a checkpointer."""
     builder = StateGraph(State)
     builder.add_node("agent", agent)
     builder.add_node("human_approval", human_approval)
     builder.add_node("tools", ToolNode(tools))
 
     builder.add_edge(START, "agent")
-    builder.add_conditional_edges("agent", should_continue, ["human_approval", END])
     builder.add_edge("tools", "agent")
+    return builder.compile()
+
 
-    checkpointer = SqliteSaver(get_connection())
-    return builder.compile(checkpointer=checkpointer)
+def build_graph():
+    checkpointer = SqliteSaver(get_connection(), serde=ZstdSerializer())
+    # A fresh graph object per call (a "restarted process" shares nothing
+    # mutable with the old one), without recompiling the node graph
+    return _compile_graph().copy(update={"checkpointer": checkpointer})
 
 
 # =============================================================================
@@ -237,6 +375,7 @@ def test_multiple_approvals_with_restart():
     result = graph2.invoke(Command(resume={"action": "approve"}), config=config)
 
     print(f"  Final approval_count: {result['approval_count']}")
+    print(f"  Audit log entries (chain verified): {get_audit_log().verify(thread_id)}")
 
 
 def test_reject_after_restart():
@@ -303,19 +442,25 @@ def show_summary():
    - Server can restart without losing pending approvals
    - Long-running approval workflows are safe
    - Need external system to track pending approvals
+   - Approval decisions: HMAC-chained audit_log table, not checkpoint state
+     (set AUDIT_HMAC_KEY; one entry per tool_call_id even if the node replays)
    - Notification on restart: check for interrupted threads
 """)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "basic":
-        test_hitl_survives_restart()
-    elif len(sys.argv) > 1 and sys.argv[1] == "multi":
-        test_multiple_approvals_with_restart()
-    elif len(sys.argv) > 1 and sys.argv[1] == "reject":
-        test_reject_after_restart()
-    else:
-        test_hitl_survives_restart()
-        test_multiple_approvals_with_restart()
-        test_reject_after_restart()
+    tests = {
+        "basic": test_hitl_survives_restart,
+        "multi": test_multiple_approvals_with_restart,
+        "reject": test_reject_after_restart,
+    }
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode is None:
+        for test in tests.values():
+            test()
         show_summary()
+    elif mode in tests:
+        tests[mode]()
+    else:
+        print(f"Unknown mode: {mode} (choose from: {', '.join(tests)})")
+        sys.exit(2)
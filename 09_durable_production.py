@@ -3,36 +3,104 @@ Durable Execution - Part 3: Production Considerations
 Concurrent execution, cleanup, state migration, checkpoint size
 """
 
+import asyncio
 import os
 import sys
 import sqlite3
 import threading
 import time
+from functools import partial
 from typing import Annotated, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langchain_core.messages import HumanMessage, AIMessage
 
-DB_PATH = "checkpoints_prod.db"
+from checkpoint_serde import ZstdSerializer
 
-_conn = None
+DB_PATH = "checkpoints_prod.db"
 
-def get_connection():
-    global _conn
-    if _conn is None:
-        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    return _conn
+# One shared writer connection for the checkpointer (SqliteSaver serializes
+# its reads and writes on its lock), plus a read-only connection per thread
+# for direct queries against the checkpoint tables
+_writer = None
+_readers: dict[int, sqlite3.Connection] = {}
+_conns_lock = threading.Lock()
+
+def get_connection(readonly: bool = False):
+    global _writer
+    with _conns_lock:
+        if readonly:
+            conn = _readers.get(threading.get_ident())
+            if conn is None:
+                # WAL: read-only connections see committed checkpoints without
+                # waiting on (or blocking) the writer
+                # (check_same_thread=False only so reset_connection can close it)
+                conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+                conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+                _readers[threading.get_ident()] = conn
+            return conn
+        if _writer is None:
+            # check_same_thread=False: LangGraph writes checkpoints from its
+            # background executor, not the caller's thread
+            _writer = sqlite3.connect(DB_PATH, check_same_thread=False)
+            # 8KB pages: a compressed checkpoint row mostly fits in one page.
+            # Only takes effect on a new DB (before WAL / the first table);
+            # reset_connection() recreates the file, so that's every test.
+            _writer.execute("PRAGMA page_size=8192")
+            # WAL + synchronous=NORMAL: a checkpoint commit appends to the WAL
+            # without an fsync; durable across app crashes (not OS power loss)
+            _writer.execute("PRAGMA journal_mode=WAL")
+            _writer.execute("PRAGMA synchronous=NORMAL")
+            _writer.execute("PRAGMA temp_store=MEMORY")
+            _writer.execute("PRAGMA cache_size=-65536")  # 64MB
+            _writer.execute("PRAGMA mmap_size=268435456")  # 256MB
+        return _writer
 
 def reset_connection():
-    global _conn
-    if _conn:
-        _conn.close()
-    _conn = None
+    global _writer
+    with _conns_lock:
+        for conn in _readers.values():
+            conn.close()
+        _readers.clear()
+        if _writer:
+            _writer.close()
+        _writer = None
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
 
 
+def db_logical_size(conn) -> int:
+    """DB size in bytes as SQLite sees it, including pages still in the WAL."""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def prune_checkpoints(conn, thread_id: str, keep_last: int = 20) -> int:
+    """Delete all but the newest `keep_last` checkpoints of a thread.
+
+    Works on SqliteSaver's own tables; pending writes of the deleted
+    checkpoints go with them. Returns the number of checkpoints deleted.
+    """
+    with conn:
+        deleted = conn.execute(
+            """DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id NOT IN (
+                SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+                ORDER BY checkpoint_id DESC LIMIT ?
+            )""",
+            (thread_id, thread_id, keep_last),
+        ).rowcount
+        conn.execute(
+            """DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN (
+                SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?
+            )""",
+            (thread_id, thread_id),
+        )
+    return deleted
+
+
 # =============================================================================
 # State
 # =============================================================================
@@ -46,21 +114,23 @@ class State(TypedDict):
 # Simple nodes for testing
 # =============================================================================
 
-def increment(state: State) -> State:
-    time.sleep(0.1)  # Simulate work
+def increment(state: State, work_seconds: float = 0.0) -> State:
+    if work_seconds:
+        time.sleep(work_seconds)  # Simulate work
     return {
         "messages": [AIMessage(content=f"Counter: {state['counter'] + 1}")],
         "counter": state["counter"] + 1
     }
 
 
-def build_graph():
+def build_graph(checkpointer=None, work_seconds: float = 0.0):
     builder = StateGraph(State)
-    builder.add_node("increment", increment)
+    builder.add_node("increment", partial(increment, work_seconds=work_seconds))
     builder.add_edge(START, "increment")
     builder.add_edge("increment", END)
 
-    checkpointer = SqliteSaver(get_connection())
+    if checkpointer is None:
+        checkpointer = SqliteSaver(get_connection(), serde=ZstdSerializer())
     return builder.compile(checkpointer=checkpointer)
 
 
@@ -68,8 +138,8 @@ def build_graph():
 # Test: Concurrent execution on same thread_id
 # =============================================================================
 
-def test_concurrent_same_thread():
-    """What happens with concurrent invoke() on same thread_id?"""
+async def test_concurrent_same_thread():
+    """What happens with concurrent ainvoke() on same thread_id?"""
     print("\n" + "="*60)
     print("TEST: Concurrent Execution (Same thread_id)")
     print("="*60)
@@ -82,38 +152,83 @@ def test_concurrent_same_thread():
     results = []
     errors = []
 
-    def run_invoke(run_id):
+    # aiosqlite runs the connection on its own thread, so checkpoint writes
+    # don't block the event loop while the other runs are waiting
+    async with AsyncSqliteSaver.from_conn_string(DB_PATH) as checkpointer:
+        # Simulated work so the overlap between runs shows up in the timing
+        graph = build_graph(checkpointer, work_seconds=0.1)
+
+        async def run_invoke(run_id):
+            try:
+                result = await graph.ainvoke(
+                    {"messages": [HumanMessage(content=f"Run {run_id}")], "counter": 0},
+                    config=config
+                )
+                results.append((run_id, result["counter"]))
+            except Exception as e:
+                errors.append((run_id, str(e)))
+
+        print("\nStarting 3 concurrent invocations on same thread_id...")
+        start = time.perf_counter()
+        await asyncio.gather(*(run_invoke(i) for i in range(3)))
+        print(f"Elapsed: {time.perf_counter() - start:.2f}s (runs overlap on one event loop)")
+
+        print(f"\nResults: {results}")
+        print(f"Errors: {errors}")
+
+        # Check final state
+        state = await graph.aget_state(config)
+        print(f"Final counter: {state.values.get('counter')}")
+        print(f"Message count: {len(state.values.get('messages', []))}")
+
+
+def test_concurrent_read_write():
+    """Readers listing history while other threads write checkpoints."""
+    print("\n" + "="*60)
+    print("TEST: Concurrent Reads and Writes (threads)")
+    print("="*60)
+
+    reset_connection()
+
+    graph = build_graph()
+    checkpointer = graph.checkpointer
+    errors = []
+    done = threading.Event()
+
+    def write(i):
         try:
-            graph = build_graph()
-            result = graph.invoke(
-                {"messages": [HumanMessage(content=f"Run {run_id}")], "counter": 0},
-                config=config
-            )
-            results.append((run_id, result["counter"]))
+            for _ in range(30):
+                graph.invoke(
+                    {"messages": [HumanMessage(content=f"Writer {i}")], "counter": 0},
+                    config={"configurable": {"thread_id": f"rw-{i}"}},
+                )
         except Exception as e:
-            errors.append((run_id, str(e)))
+            errors.append(f"writer {i}: {e!r}")
 
-    # Start multiple threads
-    threads = []
-    for i in range(3):
-        t = threading.Thread(target=run_invoke, args=(i,))
-        threads.append(t)
+    def read(i):
+        try:
+            while not done.is_set():
+                for _ in graph.get_state_history({"configurable": {"thread_id": f"rw-{i % 3}"}}):
+                    pass
+                for _ in checkpointer.list(None, limit=20):
+                    pass
+        except Exception as e:
+            errors.append(f"reader {i}: {e!r}")
 
-    print("\nStarting 3 concurrent invocations on same thread_id...")
-    for t in threads:
+    writers = [threading.Thread(target=write, args=(i,)) for i in range(3)]
+    readers = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+    start = time.perf_counter()
+    for t in writers + readers:
         t.start()
-
-    for t in threads:
+    for t in writers:
+        t.join()
+    done.set()
+    for t in readers:
         t.join()
 
-    print(f"\nResults: {results}")
+    print(f"\n3 writer threads x 30 runs, 4 reader threads: {time.perf_counter() - start:.2f}s")
     print(f"Errors: {errors}")
-
-    # Check final state
-    graph = build_graph()
-    state = graph.get_state(config)
-    print(f"Final counter: {state.values.get('counter')}")
-    print(f"Message count: {len(state.values.get('messages', []))}")
+    assert not errors, errors
 
 
 # =============================================================================
@@ -137,12 +252,15 @@ def test_checkpoint_size_growth():
         # Create messages of increasing size
         messages = [HumanMessage(content=f"Message {j}: " + "x" * 100) for j in range(i + 1)]
 
+        # Only the final state matters here: durability="exit" persists one
+        # checkpoint per run instead of one commit per superstep
         graph.invoke(
             {"messages": messages, "counter": 0},
-            config=config
+            config=config,
+            durability="exit",
         )
 
-        size = os.path.getsize(DB_PATH)
+        size = db_logical_size(get_connection())
         sizes.append((i + 1, size))
         print(f"  {i + 1} threads, {i + 1} msgs each: {size / 1024:.1f} KB")
 
@@ -180,7 +298,7 @@ def test_checkpoint_history():
     builder.add_edge("step2", "step3")
     builder.add_edge("step3", END)
 
-    checkpointer = SqliteSaver(get_connection())
+    checkpointer = SqliteSaver(get_connection(), serde=ZstdSerializer())
     graph = builder.compile(checkpointer=checkpointer)
 
     config = {"configurable": {"thread_id": "history-test"}}
@@ -191,17 +309,36 @@ def test_checkpoint_history():
     )
 
     print("\nCheckpoint history (most recent first):")
-    history = list(graph.get_state_history(config))
-    for i, state in enumerate(history):
+    # Iterate lazily: only one historical state is materialized at a time
+    total = 0
+    for i, state in enumerate(graph.get_state_history(config)):
         print(f"  [{i}] counter={state.values.get('counter')}, next={state.next}")
+        total += 1
+
+    print(f"\nTotal checkpoints: {total}")
+    print(f"DB size: {db_logical_size(get_connection()) / 1024:.1f} KB")
 
-    print(f"\nTotal checkpoints: {len(history)}")
-    print(f"DB size: {os.path.getsize(DB_PATH) / 1024:.1f} KB")
+    # 10 more runs = 50 more checkpoints, then a cleanup pass
+    for i in range(10):
+        graph.invoke(
+            {"messages": [HumanMessage(content=f"Turn {i}")], "counter": 0},
+            config=config
+        )
+    keep_last = 20
+    deleted = prune_checkpoints(get_connection(), config["configurable"]["thread_id"], keep_last)
+    # Counting needs no state at all: ask the database directly
+    kept = get_connection(readonly=True).execute(
+        "SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (config["configurable"]["thread_id"],)
+    ).fetchone()[0]
+    print(f"After 10 more runs + prune_checkpoints(keep_last={keep_last}): {deleted} deleted, {kept} kept")
+    assert kept == keep_last, kept
+    # The newest checkpoint still resumes normally
+    print(f"Latest counter: {graph.get_state(config).values.get('counter')}")
 
     print("""
 Note: LangGraph does NOT auto-cleanup old checkpoints.
 For production, you need to:
-1. Periodically delete old checkpoints
+1. Periodically delete old checkpoints (prune_checkpoints keeps the newest N)
 2. Or use checkpoint_id to restore specific points
 3. Monitor DB size growth
 """)
@@ -233,30 +370,43 @@ def test_thread_listing():
     print("\nAttempting to list threads...")
 
     # SqliteSaver doesn't have a direct list_threads method
-    # We need to query the DB directly
-    import sqlite3
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    # We need to query the DB directly (read-only connection, doesn't block writes)
+    cursor = get_connection(readonly=True).cursor()
 
     # Check table structure
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
     tables = cursor.fetchall()
     print(f"Tables: {[t[0] for t in tables]}")
 
-    # Try to get unique thread_ids
+    # Try to get unique thread_ids. The primary key index is already ordered by
+    # thread_id, so hop from one thread to the next (one index seek per thread)
+    # instead of scanning every checkpoint row like SELECT DISTINCT does.
+    list_threads = """
+        WITH RECURSIVE t(thread_id) AS (
+            SELECT MIN(thread_id) FROM checkpoints
+            UNION ALL
+            SELECT (SELECT MIN(thread_id) FROM checkpoints WHERE thread_id > t.thread_id)
+            FROM t WHERE t.thread_id IS NOT NULL
+        )
+        SELECT thread_id FROM t WHERE thread_id IS NOT NULL
+    """
     try:
-        cursor.execute("SELECT DISTINCT thread_id FROM checkpoints")
+        cursor.execute(list_threads)
         threads = cursor.fetchall()
         print(f"Thread IDs: {[t[0] for t in threads]}")
+        cursor.execute("EXPLAIN QUERY PLAN " + list_threads)
+        print(f"Query plan: {[row[-1] for row in cursor.fetchall()]}")
     except Exception as e:
         print(f"Could not query threads: {e}")
 
-    conn.close()
+    cursor.close()
 
     print("""
 Observation:
 - No built-in API to list all thread_ids
 - Must query checkpointer storage directly
+- (thread_id, checkpoint_ns, checkpoint_id) primary key already indexes
+  per-thread lookups; no extra index needed
 - Postgres/SQLite have different schemas
 - Need custom cleanup jobs
 """)
@@ -287,6 +437,7 @@ def show_summary():
    - No built-in retention policy
    - Must implement custom cleanup job
    - Query checkpointer storage directly
+   - prune_checkpoints(): keep the newest N per thread (plain DELETE)
 
 4. THREAD MANAGEMENT:
    - No API to list all threads
@@ -311,17 +462,20 @@ def show_summary():
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "concurrent":
-        test_concurrent_same_thread()
-    elif len(sys.argv) > 1 and sys.argv[1] == "size":
-        test_checkpoint_size_growth()
-    elif len(sys.argv) > 1 and sys.argv[1] == "history":
-        test_checkpoint_history()
-    elif len(sys.argv) > 1 and sys.argv[1] == "threads":
-        test_thread_listing()
-    else:
-        test_concurrent_same_thread()
-        test_checkpoint_size_growth()
-        test_checkpoint_history()
-        test_thread_listing()
+    tests = {
+        "concurrent": lambda: asyncio.run(test_concurrent_same_thread()),
+        "readwrite": test_concurrent_read_write,
+        "size": test_checkpoint_size_growth,
+        "history": test_checkpoint_history,
+        "threads": test_thread_listing,
+    }
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode is None:
+        for test in tests.values():
+            test()
         show_summary()
+    elif mode in tests:
+        tests[mode]()
+    else:
+        print(f"Unknown mode: {mode} (choose from: {', '.join(tests)})")
+        sys.exit(2)
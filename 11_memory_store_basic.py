@@ -9,6 +9,7 @@ Goal: Verify InMemoryStore basic CRUD operations
 Reference: https://langchain-ai.github.io/langgraph/concepts/memory/
 """
 
+from langgraph.store.base import PutOp
 from langgraph.store.memory import InMemoryStore
 
 
@@ -48,13 +49,15 @@ def main():
     print("Test 2: Namespace structure (folder-like)")
     print("-" * 40)
 
-    # Multiple users with same structure
-    store.put(("users", "user_123"), "profile", {"name": "Tanaka", "age": 30})
-    store.put(("users", "user_456"), "profile", {"name": "Suzuki", "age": 25})
-    store.put(("users", "user_456"), "preferences", {"theme": "light", "language": "en"})
-
-    # Different namespace
-    store.put(("system", "config"), "api_settings", {"timeout": 30, "retries": 3})
+    # batch(): several writes in one call (one pass through the store)
+    store.batch([
+        # Multiple users with same structure
+        PutOp(("users", "user_123"), "profile", {"name": "Tanaka", "age": 30}),
+        PutOp(("users", "user_456"), "profile", {"name": "Suzuki", "age": 25}),
+        PutOp(("users", "user_456"), "preferences", {"theme": "light", "language": "en"}),
+        # Different namespace
+        PutOp(("system", "config"), "api_settings", {"timeout": 30, "retries": 3}),
+    ])
 
     print("Stored data structure:")
     print("  users/")
@@ -75,17 +78,15 @@ def main():
     print("Test 3: Search within namespace")
     print("-" * 40)
 
-    # Search all items in a namespace
+    # Search all items in a namespace (search() returns a list: count and
+    # iterate the same result instead of searching twice)
     results = store.search(("users", "user_123"))
-    print(f"Search ('users', 'user_123'): {len(list(results))} items found")
-
-    # Re-search (iterator was consumed)
-    results = list(store.search(("users", "user_123")))
+    print(f"Search ('users', 'user_123'): {len(results)} items found")
     for item in results:
         print(f"  - {item.key}: {item.value}")
 
     # Search in parent namespace (all users)
-    results = list(store.search(("users",)))
+    results = store.search(("users",))
     print(f"\nSearch ('users',): {len(results)} items found")
     for item in results:
         print(f"  - {item.namespace}/{item.key}: {item.value}")
@@ -150,6 +151,7 @@ Store Basic Operations:
   - get(namespace, key): Retrieve data (returns None if not found)
   - delete(namespace, key): Remove data
   - search(namespace): List items in namespace
+  - batch([PutOp(...), GetOp(...), ...]): Many operations in one call
 
 Namespace Structure:
   - Tuple-based hierarchical structure: ("level1", "level2", ...)
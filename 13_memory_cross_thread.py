@@ -10,9 +10,13 @@ Reference: https://langchain-ai.github.io/langgraph/concepts/memory/
 """
 
 import os
+import re
+from collections import defaultdict
+from itertools import count
 from typing import Annotated, TypedDict
 
 from langchain_anthropic import ChatAnthropic
+from langchain.embeddings import init_embeddings
 from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.store.memory import InMemoryStore
@@ -20,11 +24,21 @@ from langgraph.store.base import BaseStore
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
+from memory_embeddings import CachedEmbeddings
+
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
 
 
+# Memory commands, one case-insensitive pass: the earliest match wins and
+# the group name is the command
+COMMAND_RE = re.compile(
+    r"(?P<remember>remember:)|(?P<recall>what do you remember)|(?P<search>search:)",
+    re.IGNORECASE,
+)
+
+
 def main():
     print("=" * 60)
     print("LangGraph Memory - Cross-Thread Persistence")
@@ -46,10 +60,16 @@ def main():
     print("-" * 40)
 
     # Store: Long-term memory (cross-thread)
+    # text-embedding-3 models can return shorter vectors (e.g.
+    # MEMORY_EMBED_DIMS=512): 3x less RAM per memory and cheaper scoring,
+    # at slightly lower recall
+    dims = int(os.getenv("MEMORY_EMBED_DIMS", "1536"))
     store = InMemoryStore(
         index={
-            "dims": 1536,
-            "embed": "openai:text-embedding-3-small",
+            "dims": dims,
+            "embed": CachedEmbeddings(
+                init_embeddings("openai:text-embedding-3-small", dimensions=dims)
+            ),
         }
     )
 
@@ -73,38 +93,45 @@ Two separate memory systems:
     # Build a simple graph with store access
     # =========================================================================
     llm = ChatAnthropic(model="claude-sonnet-4-20250514")
+    # user_id -> next memory number (no namespace scan per write)
+    memory_ids = defaultdict(count)
+    # user_id -> ("users", user_id), built once per user
+    namespaces = {}
 
     def agent_node(state: State, config: RunnableConfig, *, store: BaseStore):
         """Agent that can read/write to store."""
         user_id = config.get("configurable", {}).get("user_id", "anonymous")
+        namespace = namespaces.get(user_id)
+        if namespace is None:
+            namespace = namespaces[user_id] = ("users", user_id)
         messages = state["messages"]
         last_message = messages[-1].content if messages else ""
 
         # Check for memory-related commands
-        if "remember:" in last_message.lower():
-            # Extract what to remember (case-insensitive)
-            lower_msg = last_message.lower()
-            idx = lower_msg.find("remember:")
-            memory_text = last_message[idx + len("remember:"):].strip()
-            memory_key = f"memory_{len(list(store.search(('users', user_id))))}"
-            store.put(("users", user_id), memory_key, {"text": memory_text})
+        match = COMMAND_RE.search(last_message)
+        command = match.lastgroup if match else None
+        idx = match.end() if match else -1
+
+        if command == "remember":
+            # Extract what to remember
+            memory_text = last_message[idx:].strip()
+            memory_key = f"memory_{next(memory_ids[user_id])}"
+            store.put(namespace, memory_key, {"text": memory_text})
             response = f"I'll remember that: '{memory_text}'"
 
-        elif "what do you remember" in last_message.lower():
+        elif command == "recall":
             # Retrieve all memories
-            memories = list(store.search(("users", user_id)))
+            memories = store.search(namespace)
             if memories:
                 memory_texts = [m.value.get("text", str(m.value)) for m in memories]
                 response = f"I remember {len(memories)} things about you:\n" + "\n".join(f"- {t}" for t in memory_texts)
             else:
                 response = "I don't have any memories about you yet."
 
-        elif "search:" in last_message.lower():
-            # Semantic search (case-insensitive)
-            lower_msg = last_message.lower()
-            idx = lower_msg.find("search:")
-            query = last_message[idx + len("search:"):].strip()
-            results = list(store.search(("users", user_id), query=query, limit=3))
+        elif command == "search":
+            # Semantic search
+            query = last_message[idx:].strip()
+            results = store.search(namespace, query=query, limit=3)
             if results:
                 response = f"Found {len(results)} relevant memories:\n"
                 for r in results:
@@ -113,9 +140,10 @@ Two separate memory systems:
                 response = "No relevant memories found."
 
         else:
-            # Normal response with LLM
-            llm_response = llm.invoke(messages)
-            response = llm_response.content
+            # Normal response with LLM. Under stream_mode="messages" LangGraph
+            # streams this call's tokens as they arrive; returning the message
+            # itself (same id) keeps it from being emitted a second time
+            return {"messages": [llm.invoke(messages)]}
 
         return {"messages": [{"role": "assistant", "content": response}]}
 
@@ -246,6 +274,25 @@ Two separate memory systems:
     print(f"User (Alice, new session): What do you remember about me?")
     print(f"Agent: {result['messages'][-1].content}")
 
+    # =========================================================================
+    # Test 6: Streamed LLM response
+    # =========================================================================
+    print("\n" + "-" * 40)
+    print("Test 6: Streamed LLM response (stream_mode=\"messages\")")
+    print("-" * 40)
+
+    print("User (Alice): Suggest a weekend plan in one sentence.")
+    print("Agent: ", end="", flush=True)
+    # Tokens print as the model produces them instead of after the full reply
+    for chunk, metadata in graph.stream(
+        {"messages": [{"role": "user", "content": "Suggest a weekend plan in one sentence."}]},
+        config=config_alice_new,
+        stream_mode="messages",
+    ):
+        if metadata["langgraph_node"] == "agent":
+            print(chunk.text, end="", flush=True)
+    print()
+
     # =========================================================================
     # Direct store inspection
     # =========================================================================
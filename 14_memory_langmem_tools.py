@@ -10,10 +10,42 @@ Reference: https://langchain-ai.github.io/langmem/
 """
 
 import os
-from langgraph.store.memory import InMemoryStore
+import threading
+from langchain.embeddings import init_embeddings
 from langgraph.prebuilt import create_react_agent
 from langmem import create_manage_memory_tool, create_search_memory_tool
 
+from memory_embeddings import CachedEmbeddings
+from memory_store import BoundedInMemoryStore
+
+
+class LockedInMemoryStore(BoundedInMemoryStore):
+    """InMemoryStore safe for parallel tool calls (ToolNode runs them in threads).
+
+    Only the dict reads/writes take the lock; embedding API calls run
+    outside it, so concurrent tools still overlap on network time.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+
+    def _prepare_ops(self, ops):
+        with self._lock:
+            return super()._prepare_ops(ops)
+
+    def _batch_search(self, ops, queryinmem_store, results):
+        with self._lock:
+            return super()._batch_search(ops, queryinmem_store, results)
+
+    def _insertinmem_store(self, to_embed, embeddings):
+        with self._lock:
+            return super()._insertinmem_store(to_embed, embeddings)
+
+    def _apply_put_ops(self, put_ops):
+        with self._lock:
+            return super()._apply_put_ops(put_ops)
+
 
 def main():
     print("=" * 60)
@@ -32,10 +64,14 @@ def main():
     print("Setup: Store and Memory Tools")
     print("-" * 40)
 
-    store = InMemoryStore(
+    # Optional shorter vectors, e.g. MEMORY_EMBED_DIMS=512 (see 13)
+    dims = int(os.getenv("MEMORY_EMBED_DIMS", "1536"))
+    store = LockedInMemoryStore(
         index={
-            "dims": 1536,
-            "embed": "openai:text-embedding-3-small",
+            "dims": dims,
+            "embed": CachedEmbeddings(
+                init_embeddings("openai:text-embedding-3-small", dimensions=dims)
+            ),
         }
     )
 
@@ -82,7 +118,7 @@ def main():
 
     # Check what was stored
     print("\n[Store contents after Test 1]")
-    memories = list(store.search(("memories", "user_123")))
+    memories = store.search(("memories", "user_123"))
     for m in memories:
         print(f"  - {m.key}: {m.value}")
 
@@ -118,7 +154,7 @@ def main():
 
     # Check stored memories
     print("\n[Store contents after Test 3]")
-    memories = list(store.search(("memories", "user_123")))
+    memories = store.search(("memories", "user_123"))
     for m in memories:
         print(f"  - {m.key}: {m.value}")
 
@@ -154,7 +190,7 @@ def main():
 
     # Check updated memories
     print("\n[Store contents after update]")
-    memories = list(store.search(("memories", "user_123")))
+    memories = store.search(("memories", "user_123"))
     for m in memories:
         print(f"  - {m.key}: {m.value}")
 
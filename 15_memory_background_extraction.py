@@ -11,9 +11,12 @@ Reference: https://langchain-ai.github.io/langmem/
 
 import asyncio
 import os
-from langgraph.store.memory import InMemoryStore
+from langchain.embeddings import init_embeddings
 from langmem import create_memory_store_manager
 
+from memory_embeddings import CachedEmbeddings
+from memory_store import BoundedInMemoryStore
+
 
 async def main():
     print("=" * 60)
@@ -32,10 +35,15 @@ async def main():
     print("Setup: Store and Memory Manager")
     print("-" * 40)
 
-    store = InMemoryStore(
+    # MEMORY_EMBED_DIMS trades a little recall for smaller vectors (see 13)
+    dims = int(os.getenv("MEMORY_EMBED_DIMS", "1536"))
+    embeddings = CachedEmbeddings(
+        init_embeddings("openai:text-embedding-3-small", dimensions=dims)
+    )
+    store = BoundedInMemoryStore(
         index={
-            "dims": 1536,
-            "embed": "openai:text-embedding-3-small",
+            "dims": dims,
+            "embed": embeddings,
         }
     )
 
@@ -80,7 +88,7 @@ async def main():
     )
 
     print("\n[Extracted memories]")
-    memories = list(store.search(("memories", "user_123")))
+    memories = store.search(("memories", "user_123"))
     for m in memories:
         print(f"  - {m.key}: {m.value}")
 
@@ -112,7 +120,7 @@ async def main():
     )
 
     print("\n[All memories after Test 2]")
-    memories = list(store.search(("memories", "user_123")))
+    memories = store.search(("memories", "user_123"))
     for m in memories:
         print(f"  - {m.key}: {m.value}")
 
@@ -142,7 +150,7 @@ async def main():
     )
 
     print("\n[All memories after consolidation]")
-    memories = list(store.search(("memories", "user_123")))
+    memories = store.search(("memories", "user_123"))
     for m in memories:
         print(f"  - {m.key}: {m.value}")
 
@@ -163,11 +171,11 @@ async def main():
 
     for query in queries:
         print(f"\nQuery: '{query}'")
-        results = list(store.search(
+        results = store.search(
             ("memories", "user_123"),
             query=query,
             limit=2
-        ))
+        )
         for r in results:
             text = r.value.get("content", r.value.get("text", str(r.value)))
             if len(text) > 80:
@@ -197,8 +205,9 @@ async def main():
         print(f"  - {m.key}: {m.value}")
 
     print("\nUser 123's memories (unchanged):")
-    count = len(list(store.search(("memories", "user_123"))))
+    count = len(store.search(("memories", "user_123")))
     print(f"  {count} memories (isolation confirmed)")
+    print(f"\nDocument embedding requests (coalesced per extraction): {embeddings.batches}")
 
     # =========================================================================
     # Summary
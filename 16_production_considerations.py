@@ -16,9 +16,28 @@ Development:
 
 Production options:
     # PostgreSQL (recommended for production)
-    from langgraph_checkpoint_postgres import PostgresSaver
+    from langgraph.checkpoint.postgres import PostgresSaver
     checkpointer = PostgresSaver.from_conn_string("postgresql://...")
 
+    # Pooled: no connect/TLS/auth handshake per request; prepare_threshold=0
+    # prepares the checkpoint upserts on first use instead of re-planning them
+    # (drop it behind pgbouncer in transaction mode)
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+
+    pool = ConnectionPool(
+        "postgresql://...",
+        min_size=4,
+        max_size=20,
+        kwargs={"autocommit": True, "row_factory": dict_row, "prepare_threshold": 0},
+    )
+    checkpointer = PostgresSaver(pool)
+    checkpointer.setup()  # once, creates tables
+
+    # put()/put_writes() already send their upserts in one pipeline (one
+    # round trip) when libpq supports it. A single dedicated connection can
+    # pipeline every call: PostgresSaver.from_conn_string(uri, pipeline=True)
+
     # SQLite (for simpler deployments)
     from langgraph.checkpoint.sqlite import SqliteSaver
     checkpointer = SqliteSaver.from_conn_string("sqlite:///checkpoints.db")
@@ -54,15 +73,48 @@ Options:
     2. Application-level timeout when polling for state
     3. Scheduled cleanup of abandoned threads
 
-    # Example: Check for stale threads
-    for thread_id in get_active_threads():
-        state = graph.get_state({"configurable": {"thread_id": thread_id}})
-        if state.next and is_stale(state.created_at, timeout=timedelta(hours=24)):
-            # Auto-reject or notify
-            graph.invoke(
-                Command(resume={"action": "reject", "reason": "Timeout"}),
-                config={"configurable": {"thread_id": thread_id}}
-            )
+    # Example: Track pending interrupts in the DB instead of calling
+    # get_state() per thread (one round trip each). An interrupt is stored as
+    # a '__interrupt__' write; the next checkpoint on the thread resolves it.
+    CREATE TABLE pending_approvals (
+        thread_id text PRIMARY KEY,
+        checkpoint_id text NOT NULL,
+        created_at timestamptz NOT NULL DEFAULT now()
+    );
+    CREATE INDEX ON pending_approvals (created_at);
+
+    CREATE FUNCTION track_interrupt() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO pending_approvals (thread_id, checkpoint_id)
+        VALUES (NEW.thread_id, NEW.checkpoint_id)
+        ON CONFLICT (thread_id) DO UPDATE SET checkpoint_id = EXCLUDED.checkpoint_id;
+        PERFORM pg_notify('pending_approval', NEW.thread_id);  -- see 4.
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+    CREATE TRIGGER on_interrupt AFTER INSERT ON checkpoint_writes
+        FOR EACH ROW WHEN (NEW.channel = '__interrupt__' AND NEW.checkpoint_ns = '')
+        EXECUTE FUNCTION track_interrupt();
+
+    CREATE FUNCTION resolve_interrupt() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM pending_approvals
+        WHERE thread_id = NEW.thread_id AND checkpoint_id < NEW.checkpoint_id;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+    CREATE TRIGGER on_checkpoint AFTER INSERT ON checkpoints
+        FOR EACH ROW WHEN (NEW.checkpoint_ns = '')
+        EXECUTE FUNCTION resolve_interrupt();
+
+    # Stale threads: one indexed range scan, however many threads exist
+    cursor.execute(
+        "SELECT thread_id FROM pending_approvals WHERE created_at < now() - interval '24 hours'"
+    )
+    for (thread_id,) in cursor:
+        # Auto-reject or notify
+        graph.invoke(
+            Command(resume={"action": "reject", "reason": "Timeout"}),
+            config={"configurable": {"thread_id": thread_id}}
+        )
 
 VERDICT: ⚠️ Must implement yourself
 
@@ -71,7 +123,8 @@ VERDICT: ⚠️ Must implement yourself
 
 LangGraph has NO notification system.
 You need to:
-    1. Detect interrupt (check state.next)
+    1. Detect interrupt (check state.next, or LISTEN pending_approval
+       on Postgres with the trigger from 3.)
     2. Send notification (email, Slack, webhook)
     3. Provide approval UI/endpoint
 
@@ -164,7 +217,74 @@ DB grows indefinitely.
 
     # Must implement cleanup job
     # Query checkpointer storage directly (DB-specific)
-    cursor.execute("DELETE FROM checkpoints WHERE created_at < ?", [cutoff])
+    # PostgresSaver's checkpoints table has no created_at column; the
+    # timestamp is the "ts" field inside the checkpoint JSONB.
+
+    # Once: index the timestamp (CONCURRENTLY = no write lock while building)
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS checkpoints_ts_idx
+        ON checkpoints ((checkpoint->>'ts'));
+
+    # Delete in small batches: one huge DELETE holds locks and writes a
+    # multi-GB WAL in a single transaction. Each batch is one statement:
+    # the checkpoint_writes DELETE joins the checkpoints the CTE removed.
+    # (tuple_row: the pool above hands out dict_row connections)
+    from psycopg.rows import tuple_row
+
+    def prune_checkpoints(conn, cutoff: datetime, batch: int = 5000):
+        cutoff_ts = cutoff.astimezone(timezone.utc).isoformat()  # same format as "ts"
+        while True:
+            (deleted,) = conn.cursor(row_factory=tuple_row).execute(
+                "WITH d AS ("
+                " DELETE FROM checkpoints WHERE ctid IN ("
+                "  SELECT ctid FROM checkpoints WHERE checkpoint->>'ts' < %s"
+                "  LIMIT %s FOR UPDATE SKIP LOCKED"
+                " ) RETURNING thread_id, checkpoint_ns, checkpoint_id"
+                "), w AS ("
+                " DELETE FROM checkpoint_writes w USING d"
+                " WHERE w.thread_id = d.thread_id"
+                " AND w.checkpoint_ns = d.checkpoint_ns"
+                " AND w.checkpoint_id = d.checkpoint_id"
+                ") SELECT count(*) FROM d",
+                (cutoff_ts, batch),
+            ).fetchone()
+            if deleted < batch:
+                break
+
+    # checkpoint_blobs rows are shared across checkpoints (keyed by channel
+    # version); sweep them separately, or delete whole threads instead via
+    # checkpointer.delete_thread(thread_id)
+
+At high volume, hash-partition the tables by thread_id (the leading
+primary-key column, so every saver query prunes to one partition):
+smaller per-partition indexes, VACUUM per partition, cleanup jobs that
+can run partition by partition in parallel.
+
+    # Before the first checkpointer.setup(): setup() uses
+    # CREATE TABLE IF NOT EXISTS, so it keeps these definitions
+    CREATE TABLE checkpoints (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL DEFAULT '',
+        checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT,
+        type TEXT,
+        checkpoint JSONB NOT NULL,
+        metadata JSONB NOT NULL DEFAULT '{}',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    ) PARTITION BY HASH (thread_id);
+    CREATE TABLE checkpoints_p0 PARTITION OF checkpoints
+        FOR VALUES WITH (MODULUS 16, REMAINDER 0);
+    ...  # p1..p15; same for checkpoint_blobs and checkpoint_writes
+
+    # Caveats:
+    # - setup()'s later migrations run CREATE INDEX CONCURRENTLY on the
+    #   parent, which Postgres rejects for partitioned tables. Those
+    #   thread_id indexes duplicate the primary key's prefix: record the
+    #   migrations as applied in checkpoint_migrations instead.
+    # - Likewise build checkpoints_ts_idx above per partition.
+    # - Still one primary and one WAL stream. To scale writes past that,
+    #   shard across databases: route each thread_id to its own saver,
+    #   e.g. savers[zlib.crc32(thread_id.encode()) % len(savers)] (not
+    #   hash(): str hashes differ per process).
 
 VERDICT: ⚠️ Must implement yourself
 
@@ -179,6 +299,8 @@ Need this for:
 
     # Must query storage directly
     cursor.execute("SELECT DISTINCT thread_id FROM checkpoints")
+    # Pending approvals only: the trigger-maintained table from 3.
+    cursor.execute("SELECT thread_id FROM pending_approvals")
 
 VERDICT: ⚠️ Must implement yourself (DB-specific)
 
@@ -193,7 +315,11 @@ Last write wins, state may be inconsistent.
     thread2: invoke(msg2, thread_id="abc")  # counter=1 (not 2!)
 
     # GOOD: Unique thread_id per conversation
-    thread_id = f"user-{user_id}-{uuid4()}"
+    # Time-ordered (UUIDv6, as LangGraph uses for checkpoint_id) rather than
+    # uuid4: new ids land at the tail of the (thread_id, ...) B-tree indexes
+    # instead of splitting random pages
+    from langgraph.checkpoint.base.id import uuid6
+    thread_id = f"user-{user_id}-{uuid6()}"
 
 VERDICT: ⚠️ Must generate unique thread_ids
 
@@ -224,6 +350,29 @@ Long conversations = large checkpoints.
     # 2. Checkpoint compression
     # 3. Max message limits
 
+Checkpoint compression = a serde wrapper around JsonPlusSerializer
+(msgpack) that zstd-compresses large payloads; see checkpoint_serde.py,
+used by 08 and 09:
+
+    from checkpoint_serde import ZstdSerializer
+
+    checkpointer = PostgresSaver(conn, serde=ZstdSerializer())
+
+    # The "+zstd" type tag keeps old uncompressed rows readable.
+    # A trained zstd dictionary helps small payloads further, but the
+    # dictionary must then be versioned and kept for every stored row.
+
+Checkpoint writes are already off the node's critical path by default:
+
+    graph.invoke(inputs, config)                      # durability="async" (default):
+                                                      # step N is saved while step N+1 runs
+    graph.invoke(inputs, config, durability="exit")   # save only when the run ends/interrupts
+    graph.invoke(inputs, config, durability="sync")   # save before the next step starts
+
+    # No custom write-behind queue needed. Use "sync" for approval-gated
+    # runs that must not lose a step on crash; "exit" for tests and batch
+    # jobs where only the final state matters (fewest writes).
+
 VERDICT: ⚠️ Monitor and manage
 
 
@@ -244,6 +393,29 @@ Production options:
         index={"dims": 1536, "embed": "openai:text-embedding-3-small"}
     )
 
+    # InMemoryStore scores every stored vector per search (O(N) scan).
+    # PostgresStore builds a pgvector HNSW index: a graph walk visiting
+    # ~log(N) neighbourhoods instead. Tune it in ann_index_config
+    # (m = links per node, ef_construction = build-time candidate list).
+    # Quantized vectors: pgvector halfvec stores 16-bit floats, half the
+    # size of vector (3 KB vs 6 KB per 1536-dim embedding), so the index
+    # scan moves half the bytes at near-identical recall
+    index={
+        "dims": 1536,
+        "embed": "openai:text-embedding-3-small",
+        "ann_index_config": {
+            "kind": "hnsw",
+            "m": 16,
+            "ef_construction": 100,
+            "vector_type": "halfvec",
+        },
+    }
+
+    # Query-time recall/speed knob (per connection, pgvector default 40):
+    #   SET hnsw.ef_search = 64;
+    # Over-fetch when filtering: search(..., filter=...) is applied after
+    # the index returns its ef_search candidates
+
 VERDICT: ✅ Good support with Postgres
 
 
@@ -296,7 +468,7 @@ Store is eventually consistent.
 Concurrent writes to same key may conflict.
 
     # Use unique keys or implement locking
-    key = f"memory_{uuid4()}"
+    key = f"memory_{uuid6()}"  # time-ordered, same reason as thread_id (#13)
     store.put(namespace, key, value)
 
 VERDICT: ⚠️ Design for eventual consistency
@@ -380,4 +552,8 @@ SUMMARY = """
 """
 
 if __name__ == "__main__":
-    print(SUMMARY)
+    import sys  # only needed when run, not on import
+
+    # One raw UTF-8 write: skips the text layer's encode, and the emoji can't
+    # raise UnicodeEncodeError on a non-UTF-8 console
+    sys.stdout.buffer.write(SUMMARY.encode("utf-8") + b"\n")
@@ -0,0 +1,36 @@
+"""
+Checkpoint serializer shared by the durable execution samples (08, 09)
+msgpack (LangGraph's JsonPlusSerializer) + zstd
+"""
+
+import zstandard
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+
+class ZstdSerializer(SerializerProtocol):
+    """Compress serialized checkpoint values with zstd.
+
+    The "+zstd" type tag keeps rows written without it readable.
+    """
+
+    # Below this size the zstd frame overhead outweighs the savings
+    min_size = 512
+
+    def __init__(self, level: int = 3):
+        self.serde = JsonPlusSerializer()
+        self.level = level
+
+    def dumps_typed(self, obj) -> tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return typ, data
+        return f"{typ}+zstd", zstandard.compress(data, self.level)
+
+    def loads_typed(self, data: tuple[str, bytes]):
+        typ, payload = data
+        if typ.endswith("+zstd"):
+            return self.serde.loads_typed(
+                (typ.removesuffix("+zstd"), zstandard.decompress(payload))
+            )
+        return self.serde.loads_typed(data)
@@ -0,0 +1,69 @@
+"""
+Embeddings wrapper shared by the memory samples (12-15)
+Query embedding cache + coalesced async document embeddings
+"""
+
+import asyncio
+from functools import lru_cache
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Memoize query embeddings and coalesce concurrent document embeddings.
+
+    A repeated search query costs no API call. aembed_documents requests
+    made in the same event-loop tick (e.g. asyncio.gather(store.aput...),
+    one embedding request per memory) are sent as one batch instead.
+    """
+
+    def __init__(self, embeddings: Embeddings, maxsize: int = 256):
+        self.embeddings = embeddings
+        # Tuples so callers can't mutate a cached vector
+        self._embed_query = lru_cache(maxsize=maxsize)(
+            lambda text: tuple(embeddings.embed_query(text))
+        )
+        self.cache_info = self._embed_query.cache_info
+        self._pending = []  # (texts, future) waiting for the next flush
+        self.batches = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return list(self._embed_query(text))
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            # Runs after the other gathered tasks have queued their texts
+            loop.call_soon(self._flush)
+        self._pending.append((texts, future))
+        return await future
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        self.batches += 1
+        task = asyncio.ensure_future(
+            self.embeddings.aembed_documents([text for texts, _ in pending for text in texts])
+        )
+
+        def deliver(task):
+            if task.cancelled():
+                for _, future in pending:
+                    future.cancel()
+                return
+            error = task.exception()
+            if error is not None:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+            vectors = task.result()
+            start = 0
+            for texts, future in pending:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(texts)])
+                start += len(texts)
+
+        task.add_done_callback(deliver)
@@ -0,0 +1,55 @@
+"""
+Bounded InMemoryStore shared by the memory samples (14, 15)
+Per-namespace LRU cap on stored memories
+"""
+
+from collections import OrderedDict, defaultdict
+from langgraph.store.base import GetOp
+from langgraph.store.memory import InMemoryStore
+
+
+class BoundedInMemoryStore(InMemoryStore):
+    """InMemoryStore keeping at most `max_per_namespace` items per namespace.
+
+    Recency (get, search hits and puts) is tracked in a separate OrderedDict
+    of keys per namespace, so evicting the least recently used item is O(1)
+    and listings keep the store's insertion order.
+    """
+
+    def __init__(self, *, max_per_namespace: int = 5000, **kwargs):
+        super().__init__(**kwargs)
+        self._recency = defaultdict(OrderedDict)
+        self.max_per_namespace = max_per_namespace
+
+    def _touch(self, namespace, key):
+        recency = self._recency.get(namespace)
+        if recency is not None and key in recency:
+            recency.move_to_end(key)
+
+    def _prepare_ops(self, ops):
+        ops = list(ops)
+        results, put_ops, search_ops = super()._prepare_ops(ops)
+        for op, item in zip(ops, results):
+            if isinstance(op, GetOp) and item is not None:
+                self._touch(op.namespace, op.key)
+        return results, put_ops, search_ops
+
+    def _batch_search(self, ops, queryinmem_store, results):
+        super()._batch_search(ops, queryinmem_store, results)
+        for i in ops:
+            for item in results[i]:
+                self._touch(item.namespace, item.key)
+
+    def _apply_put_ops(self, put_ops):
+        super()._apply_put_ops(put_ops)
+        for (namespace, key), op in put_ops.items():
+            recency = self._recency[namespace]
+            if op.value is None:
+                recency.pop(key, None)
+                continue
+            recency[key] = None
+            recency.move_to_end(key)
+            while len(recency) > self.max_per_namespace:
+                evicted, _ = recency.popitem(last=False)
+                self._data[namespace].pop(evicted, None)
+                self._vectors[namespace].pop(evicted, None)